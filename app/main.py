@@ -1,13 +1,36 @@
+import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from app.routers import scraper
+from app.services.facebook_scraper import warm_up, shut_down
+from app.services.executor import run_cpu, shutdown_executor, loop_lag
+from app.utils.utils import warm_up_parsers
 
-app = FastAPI(title="Facebook Post Scraper")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    loop_lag.start()
+    # Optional warm-up so new containers serve their first scrape without paying for Chromium launch
+    if os.getenv("SCRAPER_WARMUP", "").lower() in ("1", "true", "yes"):
+        try:
+            await warm_up()
+            # Spawns a worker and primes it when the process pool is in use
+            await run_cpu(warm_up_parsers)
+        except Exception as e:
+            print(f"Warm-up failed, continuing cold: {str(e)}")
+    yield
+    await loop_lag.stop()
+    await shut_down()
+    shutdown_executor()
+
+
+app = FastAPI(title="Facebook Post Scraper", lifespan=lifespan)
 
 # Mount templates
 app.mount("/static", StaticFiles(directory="app/templates"), name="static")
 templates = Jinja2Templates(directory="app/templates")
 
 # Include routers
-app.include_router(scraper.router)
\ No newline at end of file
+app.include_router(scraper.router)
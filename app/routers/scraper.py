@@ -2,9 +2,9 @@ from fastapi import APIRouter, Request, Form
 from fastapi.responses import StreamingResponse
 from fastapi.templating import Jinja2Templates
 from app.services.facebook_scraper import scrape_facebook_post
-from app.utils.utils import save_to_excel
-import io
-import pandas as pd
+from app.services.executor import run_cpu, loop_lag
+from app.services.budget import ScrapeBudget
+from app.utils.utils import export_excel_bytes
 
 router = APIRouter()
 templates = Jinja2Templates(directory="app/templates")
@@ -14,18 +14,27 @@ async def get_form(request: Request):
     return templates.TemplateResponse("index.html", {"request": request})
 
 @router.post("/scrape")
-async def scrape_post(request: Request, url: str = Form(...)):
+async def scrape_post(
+    request: Request,
+    url: str = Form(...),
+    deadline: float = Form(None),
+    max_comments: int = Form(None),
+    max_replies_per_comment: int = Form(None),
+    max_requests: int = Form(None),
+    cursor: str = Form(None),
+    cursor_offset: int = Form(0),
+):
     try:
-        post_data = await scrape_facebook_post(url)
+        limits = (deadline, max_comments, max_replies_per_comment, max_requests)
+        budget = ScrapeBudget(*limits) if any(limit is not None for limit in limits) else None
+        post_data = await scrape_facebook_post(url, budget=budget, cursor=cursor or None, cursor_offset=cursor_offset or 0)
         
-        # Create Excel file in memory
-        output = io.BytesIO()
-        save_to_excel(post_data, output)
+        # Create Excel file in memory, off the event loop
+        workbook_bytes = await run_cpu(export_excel_bytes, post_data)
 
         # Return Excel as downloadable file
-        output.seek(0)
         return StreamingResponse(
-            iter([output.getvalue()]),
+            iter([workbook_bytes]),
             media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
             headers={"Content-Disposition": f"attachment; filename=facebook_post_{post_data['post_id']}.xlsx"}
         )
@@ -33,4 +42,8 @@ async def scrape_post(request: Request, url: str = Form(...)):
         return templates.TemplateResponse(
             "index.html",
             {"request": request, "error": f"Échec du scraping : {str(e)}", "url": url}
-        )
\ No newline at end of file
+        )
+
+@router.get("/metrics/loop-lag")
+async def get_loop_lag():
+    return loop_lag.as_dict()
@@ -0,0 +1,130 @@
+import threading
+import time
+
+
+class ScrapeBudget:
+    """
+    Per-scrape limits shared by the bootstrap, comment pagination and reply fan-out stages.
+
+    Args:
+        deadline (float, optional): Wall-clock budget in seconds.
+        max_comments (int, optional): Maximum number of top-level comments.
+        max_replies_per_comment (int, optional): Maximum replies kept per comment (and per reply).
+        max_requests (int, optional): Maximum number of upstream GraphQL requests.
+
+    Once a limit is hit, ``exhausted`` holds its name ("deadline", "max_comments",
+    "max_requests"), ``resume_cursor`` the comment cursor to continue from and
+    ``resume_offset`` how many comments of that page were already returned.
+    """
+
+    def __init__(self, deadline=None, max_comments=None, max_replies_per_comment=None, max_requests=None):
+        self.started = time.monotonic()
+        self.deadline_at = self.started + deadline if deadline is not None else None
+        self.max_comments = max_comments
+        self.max_replies_per_comment = max_replies_per_comment
+        self.max_requests = max_requests
+        self.requests = 0
+        self.comments = 0
+        self.truncated_replies = 0
+        self.exhausted = None
+        self.resume_cursor = None
+        self.resume_offset = 0
+        self._lock = threading.Lock()
+
+    def exhaust(self, reason):
+        with self._lock:
+            if self.exhausted is None:
+                self.exhausted = reason
+
+    def remaining(self):
+        """Seconds left before the deadline, or None without one."""
+        if self.deadline_at is None:
+            return None
+        return max(0.0, self.deadline_at - time.monotonic())
+
+    def expired(self):
+        """True once no more upstream requests may be made (deadline passed or request budget spent)."""
+        if self.deadline_at is not None and time.monotonic() >= self.deadline_at:
+            self.exhaust("deadline")
+        return self.exhausted in ("deadline", "max_requests")
+
+    def timeout_ms(self, default_ms):
+        """Clamp a Playwright timeout to the remaining deadline."""
+        remaining = self.remaining()
+        if remaining is None:
+            return default_ms
+        return max(1, min(default_ms, int(remaining * 1000)))
+
+    def timeout(self, default=None):
+        """Clamp a requests timeout (seconds) to the remaining deadline."""
+        remaining = self.remaining()
+        if remaining is None:
+            return default
+        return max(0.1, min(default, remaining)) if default else max(0.1, remaining)
+
+    def sleep(self, seconds):
+        """Sleep, but never past the deadline."""
+        remaining = self.remaining()
+        time.sleep(seconds if remaining is None else min(seconds, remaining))
+
+    def take_request(self):
+        """Reserve one upstream request; False once the deadline or request budget is spent."""
+        if self.expired():
+            return False
+        with self._lock:
+            if self.max_requests is not None and self.requests >= self.max_requests:
+                if self.exhausted is None:
+                    self.exhausted = "max_requests"
+                return False
+            self.requests += 1
+            return True
+
+    def take_comments(self, comments):
+        """Return the prefix of a comment page that still fits in the comment budget."""
+        with self._lock:
+            if self.max_comments is None:
+                self.comments += len(comments)
+                return comments
+            allowed = max(0, self.max_comments - self.comments)
+            self.comments += min(allowed, len(comments))
+            if len(comments) > allowed and self.exhausted is None:
+                self.exhausted = "max_comments"
+            return comments[:allowed]
+
+    def comments_full(self):
+        return self.max_comments is not None and self.comments >= self.max_comments
+
+    def take_replies(self, replies, already):
+        """Return the prefix of a reply page that fits under max_replies_per_comment."""
+        if self.max_replies_per_comment is None:
+            return replies
+        allowed = max(0, self.max_replies_per_comment - already)
+        if len(replies) > allowed:
+            with self._lock:
+                self.truncated_replies += len(replies) - allowed
+        return replies[:allowed]
+
+    def resume_at(self, cursor, offset=0):
+        """Record where a resumed crawl should continue: the page cursor and the comments of it already returned."""
+        self.resume_cursor = cursor
+        self.resume_offset = offset
+
+    def skip_replies(self, count):
+        """Record replies never fetched because a comment hit max_replies_per_comment."""
+        with self._lock:
+            self.truncated_replies += max(0, count)
+
+    def replies_full(self, already):
+        return self.max_replies_per_comment is not None and already >= self.max_replies_per_comment
+
+    def as_dict(self):
+        return {
+            "partial": self.exhausted is not None or self.truncated_replies > 0,
+            "exhausted": self.exhausted,
+            "resume_cursor": self.resume_cursor,
+            "resume_offset": self.resume_offset,
+            "elapsed_seconds": round(time.monotonic() - self.started, 3),
+            "requests": self.requests,
+            "comments": self.comments,
+            "truncated_replies": self.truncated_replies,
+        }
@@ -0,0 +1,108 @@
+import asyncio
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+# Lazily created pool shared by every request; SCRAPER_EXECUTOR is read once, when it is built
+_executor = {"pool": None, "ready": False}
+
+
+def make_executor(mode, workers=None):
+    """
+    Build a pool for CPU-bound work.
+
+    mode is "process", "thread" or "inline" (run on the event loop, the old
+    behaviour, returned as None); workers sets the pool size.
+    """
+    mode = mode.lower()
+    if mode == "process":
+        # spawn instead of fork: the parent runs Playwright and crawler threads
+        return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    if mode == "thread":
+        return ThreadPoolExecutor(max_workers=workers)
+    if mode == "inline":
+        return None
+    raise ValueError(f"Invalid SCRAPER_EXECUTOR: {mode}")
+
+
+def get_executor():
+    """
+    Return the shared pool, configured through the environment on first use.
+
+    SCRAPER_EXECUTOR selects "process" (default), "thread" or "inline";
+    SCRAPER_WORKERS sets the pool size. Later changes to the environment do not
+    replace the pool: it lives until shutdown_executor() at app shutdown.
+    """
+    if not _executor["ready"]:
+        workers = int(os.getenv("SCRAPER_WORKERS", "0")) or None
+        _executor.update({"pool": make_executor(os.getenv("SCRAPER_EXECUTOR", "process"), workers), "ready": True})
+    return _executor["pool"]
+
+
+def shutdown_executor():
+    if _executor["pool"] is not None:
+        _executor["pool"].shutdown(wait=False, cancel_futures=True)
+    _executor.update({"pool": None, "ready": False})
+
+
+async def run_in(pool, func, *args):
+    """Run func on pool, or inline on the event loop when pool is None."""
+    if pool is None:
+        return func(*args)
+    return await asyncio.get_running_loop().run_in_executor(pool, func, *args)
+
+
+async def run_cpu(func, *args):
+    """Run a CPU-bound function off the event loop; func and args must be picklable in process mode."""
+    return await run_in(get_executor(), func, *args)
+
+
+class LoopLagMonitor:
+    """Measure event-loop lag: how late a periodic sleep wakes up compared to its schedule."""
+
+    def __init__(self, interval=0.05, window=1200):
+        self.interval = interval
+        self.samples = deque(maxlen=window)
+        self.max_lag = 0.0
+        self._task = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def reset(self):
+        self.samples.clear()
+        self.max_lag = 0.0
+
+    async def _run(self):
+        while True:
+            expected = time.perf_counter() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - expected)
+            self.samples.append(lag)
+            self.max_lag = max(self.max_lag, lag)
+
+    def as_dict(self):
+        samples = sorted(self.samples)
+        if not samples:
+            return {"samples": 0, "mean_ms": None, "p99_ms": None, "max_ms": None}
+        return {
+            "samples": len(samples),
+            "mean_ms": round(1000 * sum(samples) / len(samples), 2),
+            "p99_ms": round(1000 * samples[min(len(samples) - 1, int(len(samples) * 0.99))], 2),
+            "max_ms": round(1000 * self.max_lag, 2),
+        }
+
+
+loop_lag = LoopLagMonitor()
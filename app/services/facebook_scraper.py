@@ -1,69 +1,140 @@
 import json
 import time
-import requests
-from playwright.async_api import async_playwright
 from urllib.parse import parse_qs, urlparse, unquote
 from dotenv import load_dotenv
 import os
 import asyncio
+from contextlib import asynccontextmanager
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FuturesTimeoutError
 from app.utils.utils import (
     deep_get, parse_content, clean_graphql_response, parse_graphql_comment_replies,
-    parse_facebook_post, extract_post_id_from_html, encode_feedback_id,
-    parse_html_for_params, save_to_excel
+    extract_post_id_from_html, encode_feedback_id,
+    parse_html_for_params, save_to_excel, warm_up_parsers, parse_post_html, merge_comments
 )
+from app.services.executor import run_cpu
+from app.services.budget import ScrapeBudget
+from app.services.post_index import canonicalize_url, canonical_post_url, get_post_index
+from app.utils.comment_table import CommentTable
+from app.utils.transfer import TransferStats, accept_encoding_header, read_response_text
 
 load_dotenv()
 
-async def scrape_page(urls, proxy):
-    """Scrape URLs, extract HTML and GraphQL parameters using Async Playwright."""
-    if isinstance(urls, str):
-        urls = [urls]
+# Browser kept alive between scrapes once warm_up() has run
+_runtime = {"playwright": None, "browser": None}
 
-    cookies = [
-        {"name": "datr", "value": "l1UCaAbX2BLP2Pq7J7_tjETO", "domain": ".facebook.com", "path": "/", "expires": 1779543472, "httpOnly": True, "secure": True},
-        {"name": "sb", "value": "l1UCaEBMktmKJNccbMAPQSH3", "domain": ".facebook.com", "path": "/", "expires": 1779543472, "httpOnly": True, "secure": True},
-    ]
+def get_proxy():
+    """Proxy credentials from the environment."""
+    return {
+        "username": os.getenv("PROXY_USERNAME"),
+        "password": os.getenv("PROXY_PASSWORD")
+    }
 
-    required_params = {"x-fb-lsd", "lsd", "jazoest", "__rev", "__spin_r", "__hs", "__hsi", "__csr", "dpr"}
-    collected_params = {}
-    html_content = None
-    network_params = {}
-    captured_cookies = []
-
-    async with async_playwright() as p:
-        # Prepare browser launch arguments
-        browser_args = {
-            "headless": True,
-            "args": [
-                "--disable-extensions",
-                "--disable-dev-shm-usage",
-                "--no-sandbox",
-                "--disable-gpu",
-                "--disable-setuid-sandbox",
-                "--disable-sync",
-                "--disable-translate",
-            ]
+async def launch_browser(p, proxy):
+    """Launch Chromium through the proxy, falling back to the local IP."""
+    # Prepare browser launch arguments
+    browser_args = {
+        "headless": True,
+        "args": [
+            "--disable-extensions",
+            "--disable-dev-shm-usage",
+            "--no-sandbox",
+            "--disable-gpu",
+            "--disable-setuid-sandbox",
+            "--disable-sync",
+            "--disable-translate",
+        ]
+    }
+
+    # Add proxy if credentials are provided and valid
+    use_proxy = proxy.get("username") and proxy.get("password")
+    if use_proxy:
+        browser_args["proxy"] = {
+            "server": "isp.smartproxy.com:10000",
+            "username": proxy["username"],
+            "password": proxy["password"],
         }
 
-        # Add proxy if credentials are provided and valid
-        use_proxy = proxy.get("username") and proxy.get("password")
-        if use_proxy:
-            browser_args["proxy"] = {
-                "server": "isp.smartproxy.com:10000",
-                "username": proxy["username"],
-                "password": proxy["password"],
-            }
+    try:
+        browser = await p.chromium.launch(**browser_args)
+    except Exception as e:
+        print(f"Failed to launch browser with proxy: {str(e)}. Falling back to local IP.")
+        browser_args.pop("proxy", None)  # Remove proxy config
+        browser = await p.chromium.launch(**browser_args)
+
+    if not use_proxy:
+        print("Warning: No proxy credentials provided. Using local IP address.")
+
+    return browser
+
+async def warm_up(proxy=None):
+    """Pre-launch the shared browser and prime the parsers before the first request."""
+    from playwright.async_api import async_playwright
+
+    warm_up_parsers()
+    if _runtime["browser"] is None:
+        _runtime["playwright"] = await async_playwright().start()
+        _runtime["browser"] = await launch_browser(_runtime["playwright"], proxy or get_proxy())
+
+async def shut_down():
+    """Close the shared browser started by warm_up()."""
+    if _runtime["browser"] is not None:
+        await _runtime["browser"].close()
+    if _runtime["playwright"] is not None:
+        await _runtime["playwright"].stop()
+    _runtime.update({"playwright": None, "browser": None})
+
+BOOTSTRAP_COOKIES = [
+    {"name": "datr", "value": "l1UCaAbX2BLP2Pq7J7_tjETO", "domain": ".facebook.com", "path": "/", "expires": 1779543472, "httpOnly": True, "secure": True},
+    {"name": "sb", "value": "l1UCaEBMktmKJNccbMAPQSH3", "domain": ".facebook.com", "path": "/", "expires": 1779543472, "httpOnly": True, "secure": True},
+]
+
+REQUIRED_PARAMS = {"x-fb-lsd", "lsd", "jazoest", "__rev", "__spin_r", "__hs", "__hsi", "__csr", "dpr"}
+
+def graphql_params(tokens, post_id, feedback_id):
+    """Combine session tokens (lsd, jazoest, __rev, ...) with a post's ids into comment-query params."""
+    collected_params = {"post_id": post_id, "feedback_id": feedback_id}
+    collected_params.update(tokens)
+    collected_params.update({
+        "av": "0",
+        "__user": "0",
+        "__a": "1",
+        "fb_api_caller_class": "RelayModern",
+        "fb_api_req_friendly_name": "CommentsListComponentsPaginationQuery",
+        "server_timestamps": "true",
+        "doc_id": "9445061768946657",
+        "variables": json.dumps({
+            "commentsAfterCount": -1,
+            "commentsAfterCursor": None,
+            "commentsBeforeCount": None,
+            "commentsBeforeCursor": None,
+            "commentsIntentToken": None,
+            "feedLocation": "PERMALINK",
+            "focusCommentID": None,
+            "scale": 4,
+            "useDefaultActor": False,
+            "id": feedback_id,
+            "__relay_internal__pv__IsWorkUserrelayprovider": False
+        })
+    })
+    return collected_params
 
-        try:
-            browser = await p.chromium.launch(**browser_args)
-        except Exception as e:
-            print(f"Failed to launch browser with proxy: {str(e)}. Falling back to local IP.")
-            browser_args.pop("proxy", None)  # Remove proxy config
-            browser = await p.chromium.launch(**browser_args)
+def session_tokens(params):
+    """Strip the post-specific entries from bootstrap params, leaving reusable session tokens."""
+    return {key: value for key, value in params.items() if key in REQUIRED_PARAMS}
 
-        if not use_proxy:
-            print("Warning: No proxy credentials provided. Using local IP address.")
+@asynccontextmanager
+async def browser_context(proxy):
+    """Yield a configured browser context, reusing the browser pre-launched by warm_up()."""
+    browser = _runtime["browser"]
+    playwright = None
+    if browser is None or not browser.is_connected():
+        from playwright.async_api import async_playwright
 
+        playwright = await async_playwright().start()
+        browser = await launch_browser(playwright, proxy)
+
+    try:
         context = await browser.new_context(
             no_viewport=True,
             user_agent="Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/134.0.0.0 Safari/537.36",
@@ -81,134 +152,181 @@ async def scrape_page(urls, proxy):
             java_script_enabled=True
         )
         await context.clear_cookies()
-        await context.add_cookies(cookies)
-
-        for url in urls:
-            page = await context.new_page()
-
-            async def handle_route(route):
-                request = route.request
-                # Block media requests
-                if any(request.url.endswith(ext) for ext in [".jpg", ".jpeg", ".png", ".gif", ".mp4", ".webm"]):
-                    await route.abort()
-                    return
-
-                # Handle GraphQL requests
-                if "/api/graphql/" in request.url.lower():
-                    headers = request.headers
-                    parsed_url = urlparse(request.url)
-                    query_params = parse_qs(parsed_url.query)
-                    params = {key: unquote(value[0]) if value else "" for key, value in query_params.items()}
-                    try:
-                        post_data = request.post_data
-                        if post_data:
-                            for param in post_data.split("&"):
-                                if "=" in param:
-                                    key, value = param.split("=", 1)
-                                    params[unquote(key)] = unquote(value)
-                    except Exception:
-                        pass
-
-                    network_params.update({
-                        "x-fb-lsd": headers.get("x-fb-lsd", network_params.get("x-fb-lsd", "")),
-                        "lsd": params.get("lsd", network_params.get("lsd", "")),
-                        "jazoest": params.get("jazoest", network_params.get("jazoest", "")),
-                        "__rev": params.get("__rev", network_params.get("__rev", "")),
-                        "__spin_r": params.get("__spin_r", network_params.get("__spin_r", "")),
-                        "__hs": params.get("__hs", network_params.get("__hs", "")),
-                        "__hsi": params.get("__hsi", network_params.get("__hsi", "")),
-                        "__csr": params.get("__csr", network_params.get("__csr", "")),
-                        "dpr": params.get("dpr", network_params.get("dpr", "2")),
-                    })
-
-                await route.continue_()
-
-            await page.route("**/*", handle_route)
+        await context.add_cookies(BOOTSTRAP_COOKIES)
+        try:
+            yield context
+        finally:
+            await context.close()
+    finally:
+        if playwright is not None:
+            await browser.close()
+            await playwright.stop()
+
+async def bootstrap_page(context, url, budget=None):
+    """
+    Load one post URL in its own tab and extract what the GraphQL crawl needs.
 
-            try:
-                await page.goto(url, timeout=20000)
-                await page.wait_for_load_state("networkidle", timeout=20000)
-
-                html_content = await page.content()
-                captured_cookies = await context.cookies()
-
-                post_id = extract_post_id_from_html(html_content)
-                feedback_id = encode_feedback_id(post_id)
-                collected_params["post_id"] = post_id
-                collected_params["feedback_id"] = feedback_id
-                collected_params.update(network_params)
-
-                missing_params = [param for param in required_params if param not in collected_params or not collected_params[param]]
-                if missing_params:
-                    collected_params.update(await parse_html_for_params(html_content, missing_params))
-
-                collected_params.update({
-                    "av": "0",
-                    "__user": "0",
-                    "__a": "1",
-                    "fb_api_caller_class": "RelayModern",
-                    "fb_api_req_friendly_name": "CommentsListComponentsPaginationQuery",
-                    "server_timestamps": "true",
-                    "doc_id": "9445061768946657",
-                    "variables": json.dumps({
-                        "commentsAfterCount": -1,
-                        "commentsAfterCursor": None,
-                        "commentsBeforeCount": None,
-                        "commentsBeforeCursor": None,
-                        "commentsIntentToken": None,
-                        "feedLocation": "PERMALINK",
-                        "focusCommentID": None,
-                        "scale": 4,
-                        "useDefaultActor": False,
-                        "id": feedback_id,
-                        "__relay_internal__pv__IsWorkUserrelayprovider": False
-                    })
-                })
+    Returns:
+        dict: url, post_id, feedback_id, params (GraphQL tokens), html_content,
+        cookies, post_data (parsed from the HTML) and error (None on success).
+    """
+    network_params = {}
+    result = {
+        "url": url, "post_id": None, "feedback_id": None, "params": {},
+        "html_content": None, "cookies": [], "post_data": None, "error": None
+    }
+    if budget is not None and budget.expired():
+        result["error"] = "deadline"
+        return result
+
+    async def handle_route(route):
+        request = route.request
+        # Block media requests
+        if any(request.url.endswith(ext) for ext in [".jpg", ".jpeg", ".png", ".gif", ".mp4", ".webm"]):
+            await route.abort()
+            return
 
-            except Exception as e:
-                print(f"Error scraping page {url}: {str(e)}")
-            finally:
+        # Handle GraphQL requests
+        if "/api/graphql/" in request.url.lower():
+            headers = request.headers
+            parsed_url = urlparse(request.url)
+            query_params = parse_qs(parsed_url.query)
+            params = {key: unquote(value[0]) if value else "" for key, value in query_params.items()}
+            try:
+                post_data = request.post_data
+                if post_data:
+                    for param in post_data.split("&"):
+                        if "=" in param:
+                            key, value = param.split("=", 1)
+                            params[unquote(key)] = unquote(value)
+            except Exception:
+                pass
+
+            network_params.update({
+                "x-fb-lsd": headers.get("x-fb-lsd", network_params.get("x-fb-lsd", "")),
+                "lsd": params.get("lsd", network_params.get("lsd", "")),
+                "jazoest": params.get("jazoest", network_params.get("jazoest", "")),
+                "__rev": params.get("__rev", network_params.get("__rev", "")),
+                "__spin_r": params.get("__spin_r", network_params.get("__spin_r", "")),
+                "__hs": params.get("__hs", network_params.get("__hs", "")),
+                "__hsi": params.get("__hsi", network_params.get("__hsi", "")),
+                "__csr": params.get("__csr", network_params.get("__csr", "")),
+                "dpr": params.get("dpr", network_params.get("dpr", "2")),
+            })
+
+        await route.continue_()
+
+    page = None
+    try:
+        # Opening the tab is inside the try so one failed URL never aborts the other tabs
+        page = await context.new_page()
+        await page.route("**/*", handle_route)
+        await page.goto(url, timeout=budget.timeout_ms(20000) if budget else 20000)
+        await page.wait_for_load_state("networkidle", timeout=budget.timeout_ms(20000) if budget else 20000)
+
+        html_content = await page.content()
+        result["html_content"] = html_content
+        result["cookies"] = await context.cookies()
+
+        post_id = extract_post_id_from_html(html_content)
+        feedback_id = encode_feedback_id(post_id)
+        tokens = dict(network_params)
+        missing_params = [param for param in REQUIRED_PARAMS if param not in tokens or not tokens[param]]
+        if missing_params:
+            tokens.update(await parse_html_for_params(html_content, missing_params))
+        collected_params = graphql_params(tokens, post_id, feedback_id)
+
+        result.update({"post_id": post_id, "feedback_id": feedback_id, "params": collected_params})
+
+        result["post_data"] = await run_cpu(parse_post_html, html_content)
+
+    except Exception as e:
+        print(f"Error scraping page {url}: {str(e)}")
+        result["error"] = str(e)
+    finally:
+        if page is not None:
+            try:
                 await page.close()
+            except Exception as e:
+                print(f"Error closing page {url}: {str(e)}")
+
+    return result
 
-        await browser.close()
+async def scrape_pages(urls, proxy, max_tabs=4, budget=None):
+    """
+    Bootstrap several post URLs in parallel tabs of one browser context.
+
+    Args:
+        urls (list): Facebook post URLs.
+        proxy (dict): Proxy credentials.
+        max_tabs (int): Maximum number of tabs loading at the same time.
+        budget (ScrapeBudget, optional): Deadline applied to page loads.
+
+    Returns:
+        dict: url -> bootstrap result (see bootstrap_page), in input order.
+        Duplicate URLs are loaded once and share one entry; a URL that fails
+        has its message under "error" instead of failing the whole batch.
+    """
+    if isinstance(urls, str):
+        urls = [urls]
+    urls = list(dict.fromkeys(urls))
+    semaphore = asyncio.Semaphore(max(1, max_tabs))
+
+    async with browser_context(proxy) as context:
+        async def run(url):
+            async with semaphore:
+                return await bootstrap_page(context, url, budget)
 
+        results = await asyncio.gather(*(run(url) for url in urls))
+
+    return {result["url"]: result for result in results}
+
+async def scrape_page(urls, proxy, budget=None):
+    """Scrape URLs, extract HTML and GraphQL parameters using Async Playwright.
+
+    Single-post helper kept for existing callers: returns the params, HTML and
+    cookies of the last URL that loaded. Use scrape_pages() for several posts.
+    """
+    results = await scrape_pages(urls, proxy, max_tabs=1, budget=budget)
+    collected_params, html_content, captured_cookies = {}, None, []
+    for result in results.values():
+        if result["html_content"] is not None:
+            html_content = result["html_content"]
+            captured_cookies = result["cookies"]
+        if result["error"] is None:
+            collected_params = result["params"]
     return collected_params, html_content, captured_cookies
 
-def make_graphql_request(params, cookies, url, request_type="comments", cursor=None, feedback_id=None, all_comments=None, depth=0, max_depth=10, max_retries=2):
+GRAPHQL_URL = "https://www.facebook.com/api/graphql/"
+
+def empty_page(error=None):
+    page = {"results": [], "page_info": {"end_cursor": None, "has_next_page": False}}
+    if error:
+        page["error"] = error
+    return page
+
+def build_graphql_request(params, url, request_type="comments", cursor=None, feedback_id=None, after_cursor=None):
     """
-    Unified function to make GraphQL requests for comments or replies.
-    
+    Build headers and form payload for a comments or replies GraphQL page.
+
     Args:
         params (dict): GraphQL request parameters (e.g., lsd, jazoest).
-        cookies (list): List of cookie dictionaries.
         url (str): Referer URL for the request.
-        request_type (str): 'comments' or 'replies' to determine the type of data to fetch.
-        cursor (str, optional): Pagination cursor (end_cursor for comments, expansion_token for replies).
-        feedback_id (str, optional): Feedback ID for replies.
-        all_comments (list, optional): Accumulated comments for recursive comment fetching.
-        depth (int): Current recursion depth for comments.
-        max_depth (int): Maximum recursion depth for comments.
-        max_retries (int): Maximum number of retry attempts for failed requests.
-    
+        request_type (str): 'comments' or 'replies'.
+        cursor (str, optional): end_cursor for comments, expansion_token for replies.
+        feedback_id (str, optional): Feedback ID of the comment (or reply) whose replies are fetched.
+        after_cursor (str, optional): end_cursor of the previous reply page.
+
     Returns:
-        dict or list: For comments, returns a list of all comments; for replies, returns parsed reply data.
+        tuple: (headers, payload)
     """
     if request_type not in ["comments", "replies"]:
         raise ValueError(f"Invalid request_type: {request_type}")
 
-    if all_comments is None and request_type == "comments":
-        all_comments = []
-
-    if request_type == "comments" and depth >= max_depth:
-        print(f"Reached max depth {max_depth}, stopping recursion")
-        return all_comments
-
-    graphql_url = "https://www.facebook.com/api/graphql/"
-
     # Common headers
     headers = {
         "Accept": "application/json",
-        "Accept-Encoding": "identity",
+        "Accept-Encoding": accept_encoding_header(),
         "Accept-Language": "en-US,en;q=0.9",
         "Content-Type": "application/x-www-form-urlencoded",
         "Origin": "https://www.facebook.com",
@@ -248,7 +366,7 @@ def make_graphql_request(params, cookies, url, request_type="comments", cursor=N
         variables = json.loads(params.get("variables", "{}"))
         variables["commentsAfterCursor"] = cursor
         variables["scale"] = 4
-    else:  # replies
+    else:  # replies (the same query serves deeper reply levels via the reply's feedback id)
         headers["X-FB-Friendly-Name"] = "Depth1CommentsListPaginationQuery"
         payload.update({
             "__aaid": "0",
@@ -271,7 +389,7 @@ def make_graphql_request(params, cookies, url, request_type="comments", cursor=N
             "feedLocation": "PERMALINK",
             "focusCommentID": None,
             "repliesAfterCount": None,
-            "repliesAfterCursor": None,
+            "repliesAfterCursor": after_cursor,
             "repliesBeforeCount": None,
             "repliesBeforeCursor": None,
             "scale": 2,
@@ -281,118 +399,400 @@ def make_graphql_request(params, cookies, url, request_type="comments", cursor=N
         }
 
     payload["variables"] = json.dumps(variables)
+    return headers, payload
 
+def fetch_graphql(session, params, cookies, url, request_type="comments", cursor=None, feedback_id=None, after_cursor=None, max_retries=2, stats=None, budget=None):
+    """Fetch one GraphQL page and return the decoded response text, or None once retries are exhausted.
+
+    The compressed body is streamed and decompressed chunk by chunk; wire and
+    decoded byte counts are added to stats when given. With a budget, every
+    attempt consumes one request and waits never run past the deadline.
+    """
+    import zlib
+    import requests
+    from urllib3.exceptions import HTTPError as Urllib3HTTPError
+
+    headers, payload = build_graphql_request(params, url, request_type, cursor, feedback_id, after_cursor)
     cookies_dict = {cookie["name"]: cookie["value"] for cookie in cookies}
 
+    sleep = budget.sleep if budget is not None else time.sleep
+
     for attempt in range(max_retries):
+        if budget is not None and not budget.take_request():
+            return None
         try:
-            time.sleep(0.5)  # Reduced rate limiting delay
-            response = requests.post(graphql_url, headers=headers, data=payload, cookies=cookies_dict)
-            response.raise_for_status()
-
-            if request_type == "replies":
-                return parse_graphql_comment_replies(response.text, "replies")
-
-            # For comments
-            raw_data = response.text
-            json_data = parse_content(raw_data)
-            if not json_data:
-                json_data = clean_graphql_response(raw_data)
-                json_data = json.loads(json_data) if json_data else None
-
-            if json_data:
-                comments = parse_graphql_comment_replies(json.dumps(json_data), "comments")
-                if comments and comments["results"]:
-                    for comment in comments["results"]:
-                        feedback_id = comment.get("feedback_id")
-                        reply_count = comment.get("reply_count", 0)
-                        expansion_token = comment.get("expansion_token")
-                        if feedback_id and reply_count > 0:
-                            reply = make_graphql_request(
-                                params, cookies, url, request_type="replies",
-                                cursor=expansion_token, feedback_id=feedback_id
-                            ).get("results", [])
-                            comment["replies"] = reply
-                    all_comments.extend(comments["results"])
-
-                page_info = comments.get("page_info", {})
-                next_cursor = page_info.get("end_cursor")
-                has_next_page = page_info.get("has_next_page", False)
-
-                if has_next_page and next_cursor:
-                    return make_graphql_request(
-                        params, cookies, url, request_type="comments",
-                        cursor=next_cursor, all_comments=all_comments,
-                        depth=depth + 1, max_depth=max_depth
-                    )
-
-                return all_comments
-            else:
-                print("No valid JSON data in response")
-                return all_comments
-
-        except requests.RequestException as e:
+            sleep(0.5)  # Reduced rate limiting delay
+            started = time.perf_counter()
+            timeout = budget.timeout() if budget is not None else None
+            with session.post(GRAPHQL_URL, headers=headers, data=payload, cookies=cookies_dict, stream=True, timeout=timeout) as response:
+                response.raise_for_status()
+                return read_response_text(response, stats, started)
+        # Reading response.raw directly bypasses requests' exception wrapping, so urllib3
+        # read errors and decoder failures (zlib.error, unknown Content-Encoding) land here too
+        except (requests.RequestException, Urllib3HTTPError, zlib.error, ValueError) as e:
             print(f"Attempt {attempt + 1}/{max_retries} failed for {request_type}: {str(e)}")
             if attempt == max_retries - 1:
                 print(f"Failed to fetch {request_type} after {max_retries} attempts")
-                return {"results": [], "page_info": {"end_cursor": None, "has_next_page": False}} if request_type == "replies" else all_comments
-            time.sleep(2 ** attempt)  # Exponential backoff
+                return None
+            sleep(2 ** attempt)  # Exponential backoff
+
+def parse_comments_page(raw_data, raw_timestamps=False):
+    """Parse a raw comments page into {"results", "page_info"}, plus an "error" key when the page is unusable."""
+    if not raw_data:
+        return empty_page("fetch_failed")
+    json_data = parse_content(raw_data)
+    if not json_data:
+        json_data = clean_graphql_response(raw_data)
+        try:
+            json_data = json.loads(json_data) if json_data else None
+        except json.JSONDecodeError:
+            json_data = None
+    if not json_data:
+        print("No valid JSON data in response")
+        return empty_page("invalid_json")
+    return parse_graphql_comment_replies(json.dumps(json_data), "comments", raw_timestamps)
+
+def parse_replies_page(raw_data, raw_timestamps=False):
+    """Parse a raw replies page into {"results", "page_info"}, plus an "error" key when the page is unusable."""
+    if not raw_data:
+        return empty_page("fetch_failed")
+    return parse_graphql_comment_replies(raw_data, "replies", raw_timestamps)
+
+def crawl_comments(params, cookies, url, cursor=None, max_pages=10, max_reply_depth=2, max_workers=4, max_retries=2, raw_timestamps=False, stats=None, budget=None, errors=None, cursor_offset=0):
+    """
+    Crawl every comment page and every reply page beneath them as a pipeline.
 
-async def scrape_facebook_post(url: str):
-    """Main function to scrape a Facebook post and its comments."""
-    proxy = {
-        "username": os.getenv("PROXY_USERNAME"),
-        "password": os.getenv("PROXY_PASSWORD")
-    }
-    params, html_content, cookies = await scrape_page(url, proxy)
-    comment_data = []
-    comments = make_graphql_request(params, cookies, url, request_type="comments")
-    if comments:
-        comment_data.append(comments)
-    
-    parsed_data = parse_content(html_content)
-    if not parsed_data:
-        print("Failed to parse post content, but continuing with available data")
+    Fetches run on thread pools while the calling thread parses. As soon as a
+    page's cursor is known the next comment page is submitted, together with the
+    first reply page of each comment on it, so downloads overlap with parsing.
+    Comment pages have a dedicated worker so they never queue behind reply fetches.
+    Reply pages are followed through their page_info, and replies that have
+    replies of their own are expanded up to max_reply_depth levels.
+
+    Args:
+        params (dict): GraphQL request parameters (e.g., lsd, jazoest).
+        cookies (list): List of cookie dictionaries.
+        url (str): Referer URL for the request.
+        cursor (str, optional): Comment cursor to start from.
+        max_pages (int): Maximum number of comment pages to fetch.
+        max_reply_depth (int): Deepest reply level to expand (1 = direct replies only).
+        max_workers (int): Number of concurrent reply fetches.
+        max_retries (int): Maximum number of retry attempts per page.
+        raw_timestamps (bool): Keep created_time as integer epochs.
+        stats (TransferStats, optional): Accumulator for transfer byte counts.
+        budget (ScrapeBudget, optional): Limits; when one runs out the crawl stops
+            and budget.resume_cursor/resume_offset point at the first comment not returned.
+        errors (list, optional): Receives the error of every comment page that failed
+            to fetch or parse ("fetch_failed", "invalid_json", "missing_connection").
+        cursor_offset (int): Comments at the start of the cursor's page to skip
+            (budget.resume_offset of the scrape being resumed).
+
+    Returns:
+        list: All comments, each with its nested "replies".
+    """
+    import requests
+
+    all_comments = []
+    pending = {}
+    session = requests.Session()
+    pool = ThreadPoolExecutor(max_workers=max_workers)
+    page_pool = ThreadPoolExecutor(max_workers=1)
+
+    def submit(request_type, cursor=None, feedback_id=None, after_cursor=None):
+        executor = page_pool if request_type == "comments" else pool
+        return executor.submit(
+            fetch_graphql, session, params, cookies, url, request_type,
+            cursor, feedback_id, after_cursor, max_retries, stats, budget
+        )
+
+    def expand_replies(item, depth):
+        feedback_id = item.get("feedback_id")
+        if not (feedback_id and (item.get("reply_count") or 0) > 0 and depth <= max_reply_depth):
+            return
+        if budget is not None and (budget.expired() or budget.replies_full(0)):
+            return
+        token = item.get("expansion_token")
+        pending[submit("replies", cursor=token, feedback_id=feedback_id)] = (item, token, depth)
+
+    def handle_replies(future):
+        item, token, depth = pending.pop(future)
+        try:
+            raw_data = future.result()
+        except Exception as e:
+            print(f"Reply page failed for {item.get('feedback_id')}: {str(e)}")
+            raw_data = None
+        page = parse_replies_page(raw_data, raw_timestamps)
+        results = page["results"]
+        if budget is not None:
+            results = budget.take_replies(results, len(item["replies"]))
+        cut = len(page["results"]) - len(results)  # Already counted by take_replies
+        item["replies"].extend(results)
+        page_info = page["page_info"]
+        if page_info.get("has_next_page") and page_info.get("end_cursor"):
+            if budget is not None and budget.replies_full(len(item["replies"])):
+                unfetched = (item.get("reply_count") or 0) - len(item["replies"]) - cut
+                # reply_count may lag behind; further pages still mean at least one reply was left out
+                budget.skip_replies(unfetched if unfetched > 0 or cut else 1)
+            elif budget is None or not budget.expired():
+                next_future = submit("replies", cursor=token, feedback_id=item["feedback_id"], after_cursor=page_info["end_cursor"])
+                pending[next_future] = (item, token, depth)
+        for reply in results:
+            expand_replies(reply, depth + 1)
+
+    try:
+        page_cursor = cursor
+        page_skip = cursor_offset
+        next_page = submit("comments", cursor=cursor)
+        pages = 0
+        while next_page is not None:
+            try:
+                raw_data = next_page.result(timeout=budget.remaining() if budget else None)
+            except FuturesTimeoutError:
+                raw_data = None
+                budget.exhaust("deadline")
+            except Exception as e:
+                print(f"Comment page failed: {str(e)}")
+                raw_data = None
+                if budget is not None and budget.resume_cursor is None:
+                    budget.resume_at(page_cursor, page_skip)
+            if raw_data is None and budget is not None and budget.expired():
+                budget.resume_at(page_cursor, page_skip)
+                break
+
+            page = parse_comments_page(raw_data, raw_timestamps)
+            if page.get("error") and errors is not None:
+                errors.append(page["error"])
+            pages += 1
+            next_page = None
+
+            results = page["results"][page_skip:]
+            if budget is not None:
+                kept = budget.take_comments(results)
+                if len(kept) < len(results):
+                    # Resume on this same page, past the comments already returned
+                    budget.resume_at(page_cursor, page_skip + len(kept))
+                results = kept
+            page_skip = 0
+
+            page_info = page["page_info"]
+            if page_info.get("has_next_page") and page_info.get("end_cursor"):
+                if budget is not None and budget.comments_full():
+                    budget.exhaust("max_comments")
+                if budget is not None and (budget.expired() or budget.comments_full()):
+                    if budget.resume_cursor is None:
+                        budget.resume_at(page_info["end_cursor"])
+                elif pages < max_pages:
+                    page_cursor = page_info["end_cursor"]
+                    next_page = submit("comments", cursor=page_cursor)
+                else:
+                    print(f"Reached max pages {max_pages}, stopping comment pagination")
+
+            for comment in results:
+                expand_replies(comment, 1)
+            all_comments.extend(results)
+
+            # Parse whatever reply pages already arrived while the next comment page downloads
+            for future in [f for f in pending if f.done()]:
+                handle_replies(future)
+
+        while pending:
+            done, _ = wait(list(pending), timeout=budget.remaining() if budget else None, return_when=FIRST_COMPLETED)
+            if not done:
+                budget.exhaust("deadline")
+                break
+            for future in done:
+                handle_replies(future)
+    finally:
+        # Requests still in flight after a deadline are abandoned rather than awaited
+        abandon = bool(budget and budget.expired())
+        page_pool.shutdown(wait=not abandon, cancel_futures=True)
+        pool.shutdown(wait=not abandon, cancel_futures=True)
+        session.close()
+
+    return all_comments
+
+def make_graphql_request(params, cookies, url, request_type="comments", cursor=None, feedback_id=None, all_comments=None, depth=0, max_depth=10, max_retries=2, raw_timestamps=False, stats=None, budget=None, errors=None, cursor_offset=0):
+    """
+    Unified function to make GraphQL requests for comments or replies.
     
-    post_data = parse_facebook_post(parsed_data, comment_data) if parsed_data else {
-        "post_id": params.get("post_id", "unknown"),
-        "post_url": url,
-        "comments": {"total_count": len(comments), "details": comments}
-    }
+    Args:
+        params (dict): GraphQL request parameters (e.g., lsd, jazoest).
+        cookies (list): List of cookie dictionaries.
+        url (str): Referer URL for the request.
+        request_type (str): 'comments' or 'replies' to determine the type of data to fetch.
+        cursor (str, optional): Pagination cursor (end_cursor for comments, expansion_token for replies).
+        feedback_id (str, optional): Feedback ID for replies.
+        all_comments (list, optional): Accumulated comments to extend.
+        depth (int): Number of comment pages already fetched.
+        max_depth (int): Maximum number of comment pages.
+        max_retries (int): Maximum number of retry attempts for failed requests.
+        raw_timestamps (bool): Keep created_time as integer epochs instead of formatted strings.
+        stats (TransferStats, optional): Accumulator for transfer byte counts.
+        budget (ScrapeBudget, optional): Deadline, comment, reply and request limits.
+        errors (list, optional): Receives the errors of comment pages that failed.
+        cursor_offset (int): Comments of the cursor's page already returned by an earlier, truncated crawl.
     
+    Returns:
+        dict or list: For comments, returns a list of all comments (with replies);
+        for replies, returns every reply page merged into one parsed result.
+    """
+    if request_type not in ["comments", "replies"]:
+        raise ValueError(f"Invalid request_type: {request_type}")
+
+    if request_type == "replies":
+        import requests
+
+        results = []
+        after_cursor = None
+        with requests.Session() as session:
+            while True:
+                raw_data = fetch_graphql(session, params, cookies, url, "replies", cursor, feedback_id, after_cursor, max_retries, stats, budget)
+                page = parse_replies_page(raw_data, raw_timestamps)
+                results.extend(budget.take_replies(page["results"], len(results)) if budget is not None else page["results"])
+                page_info = page["page_info"]
+                if not (page_info.get("has_next_page") and page_info.get("end_cursor")):
+                    return {"results": results, "page_info": page_info}
+                if budget is not None and (budget.expired() or budget.replies_full(len(results))):
+                    return {"results": results, "page_info": page_info}
+                after_cursor = page_info["end_cursor"]
+
+    if all_comments is None:
+        all_comments = []
+
+    if depth >= max_depth:
+        print(f"Reached max depth {max_depth}, stopping recursion")
+        return all_comments
+
+    all_comments.extend(crawl_comments(
+        params, cookies, url, cursor=cursor, cursor_offset=cursor_offset, max_pages=max_depth - depth,
+        max_retries=max_retries, raw_timestamps=raw_timestamps, stats=stats, budget=budget, errors=errors
+    ))
+    return all_comments
+
+async def scrape_facebook_post(url: str, as_table: bool = False, budget: ScrapeBudget = None, cursor: str = None, cursor_offset: int = 0):
+    """Main function to scrape a Facebook post and its comments.
+
+    With as_table=True, returns a CommentTable (post fields in ``table.post``)
+    instead of the nested dict. With a budget, the scrape stops when a limit runs
+    out and returns what it has, with post_data["partial"] set and the resume
+    cursor and offset under post_data["budget"]; pass them back as cursor and
+    cursor_offset to continue the comment crawl without repeating comments.
+
+    The URL is canonicalized and looked up in the post index: a known post whose
+    cached post fields and session are both fresh skips the page load. If the
+    cached session's comment pages fail (fetch errors, non-JSON or error
+    responses) and nothing was crawled, the page is loaded again and its
+    session is saved over the cached one.
+    Every result carries canonical_post_id/canonical_url whichever URL shape was given.
+    """
+    canonical = canonicalize_url(url)
+    index = await asyncio.to_thread(get_post_index)
+    # SQLite calls block, so the index is always used through a worker thread
+    known = await asyncio.to_thread(index.lookup, canonical["key"]) if index else None
+    # Skip the page load only when both the session tokens and the cached post fields are fresh
+    session = await asyncio.to_thread(index.session) if known and known["post"] else None
+    transfer_stats = TransferStats()
+
+    def crawl(params, cookies, errors=None):
+        # The crawl blocks on requests and its thread pool, so keep it off the event loop
+        return asyncio.to_thread(
+            make_graphql_request, params, cookies, url, request_type="comments", cursor=cursor, cursor_offset=cursor_offset,
+            raw_timestamps=as_table, stats=transfer_stats, budget=budget, errors=errors
+        )
+
+    post_data = None
+    needs_bootstrap = True
+    if session:
+        params = graphql_params(session["params"], known["post_id"], known["feedback_id"])
+        crawl_errors = []
+        comments = await crawl(params, session["cookies"], crawl_errors)
+        # Only failed pages mean the tokens were rejected; a post may simply have no comments
+        if crawl_errors and not comments and not (budget is not None and budget.expired()):
+            print(f"Cached session failed ({', '.join(crawl_errors)}), bootstrapping the page again")
+            if budget is not None:
+                budget.resume_at(None)
+        else:
+            # Same shape as a bootstrap: the cached HTML-embedded comments and total_count, merged with the crawl
+            post_data = dict(known["post"])
+            post_data["comments"] = dict(post_data.get("comments") or {"total_count": 0, "details": []})
+            post_data["comments"]["details"] = list(post_data["comments"].get("details") or [])
+            post_data = merge_comments(post_data, [comments] if comments else [])
+            post_data["bootstrap"] = "cached"
+            needs_bootstrap = False
+
+    if needs_bootstrap:
+        bootstrap = (await scrape_pages([url], get_proxy(), max_tabs=1, budget=budget))[url]
+        params, cookies, bootstrap_post = bootstrap["params"], bootstrap["cookies"], bootstrap["post_data"]
+        if index and params.get("post_id"):
+            await asyncio.to_thread(index.save_session, session_tokens(params), cookies)
+
+        comments = await crawl(params, cookies)
+        comment_data = [comments] if comments else []
+
+        cached = None
+        if bootstrap_post:
+            # Cache the post fields with the comments embedded in the HTML (not the crawled ones)
+            cached = dict(bootstrap_post)
+            html_comments = bootstrap_post.get("comments") or {}
+            cached["comments"] = {
+                "total_count": html_comments.get("total_count", 0),
+                "details": list(html_comments.get("details") or []),
+            }
+        # The post was already parsed from the page during the bootstrap; only the crawled comments are merged in
+        post_data = merge_comments(bootstrap_post, comment_data) if bootstrap_post else None
+        if post_data and index and params.get("post_id"):
+            await asyncio.to_thread(
+                index.remember, [canonical["key"]], params["post_id"], params["feedback_id"], canonical["url"], cached
+            )
+        elif index and params.get("post_id"):
+            await asyncio.to_thread(
+                index.remember, [canonical["key"]], params["post_id"], params["feedback_id"], canonical["url"]
+            )
+
+    if not post_data:
+        print("Failed to parse post content, but continuing with available data")
+        post_data = {
+            "post_id": params.get("post_id", "unknown"),
+            "post_url": url,
+            "comments": {"total_count": len(comments), "details": comments}
+        }
+
+    if params.get("post_id"):
+        post_data["canonical_post_id"] = params["post_id"]
+        post_data["canonical_url"] = canonical_post_url(params["post_id"])
+    post_data["transfer"] = transfer_stats.as_dict()
+    if budget is not None:
+        post_data["budget"] = budget.as_dict()
+        post_data["partial"] = post_data["budget"]["partial"]
+
+    if as_table:
+        return CommentTable.from_post_data(post_data)
     return post_data
 
 if __name__ == "__main__":
     async def main():
-        proxy = {
-            "username": os.getenv("PROXY_USERNAME"),
-            "password": os.getenv("PROXY_PASSWORD")
-        }
         urls = ["https://www.facebook.com/Gate7.online/posts/pfbid0kAFpBv4fFPjL7dS4fAdZKLt7Yb46pKBsftg1GThLSsboWq2enfG3TQkcfkgdYPTgl"]
         start_time = time.time()
         
         try:
-            params, html_content, cookies = await scrape_page(urls, proxy)
+            results = await scrape_pages(urls, get_proxy())
         except Exception as e:
             print(f"Error during scraping: {str(e)}")
             return
         
-        comment_data = []
-        for url in urls:
-            comments = make_graphql_request(params, cookies, url, request_type="comments")
-            if comments:
-                comment_data.append(comments)
-        
-        parsed_data = parse_content(html_content)
-        post_data = parse_facebook_post(parsed_data, comment_data) if parsed_data else {
-            "post_id": params.get("post_id", "unknown"),
-            "post_url": url,
-            "comments": {"total_count": len(comments), "details": comments}
-        }
-        if post_data:
-            filename = f"facebook_post_{post_data['post_id']}.xlsx"
-            save_to_excel(post_data, filename)
-            print(f"Data saved to {filename}")
+        for url, result in results.items():
+            if result["error"]:
+                continue
+            comments = make_graphql_request(result["params"], result["cookies"], url, request_type="comments")
+            post_data = merge_comments(result["post_data"], [comments] if comments else []) if result["post_data"] else {
+                "post_id": result["post_id"] or "unknown",
+                "post_url": url,
+                "comments": {"total_count": len(comments), "details": comments}
+            }
+            if post_data:
+                filename = f"facebook_post_{post_data['post_id']}.xlsx"
+                save_to_excel(post_data, filename)
+                print(f"Data saved to {filename}")
         
         print(f"Execution time: {time.time() - start_time} seconds")
     
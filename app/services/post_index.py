@@ -0,0 +1,213 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import parse_qs, unquote, urlparse
+
+FACEBOOK_HOST = "www.facebook.com"
+
+# Hosts serving the same posts under another subdomain
+_HOST_ALIASES = {
+    "facebook.com", "m.facebook.com", "mbasic.facebook.com", "web.facebook.com",
+    "touch.facebook.com", "mobile.facebook.com", "free.facebook.com",
+    "business.facebook.com", "fb.com", "www.fb.com", "m.fb.com",
+}
+
+_NUMERIC = re.compile(r"^[0-9]{5,}$")
+_PFBID = re.compile(r"^pfbid0[0-9A-Za-z]+$")
+
+# (path regex, key kind); the first group is the post identifier
+_PATH_PATTERNS = [
+    (re.compile(r"^/groups/[^/]+/(?:posts|permalink)/([^/]+)"), "post"),
+    (re.compile(r"^/[^/]+/posts/([^/]+)"), "post"),
+    (re.compile(r"^/[^/]+/videos/(?:[^/]+/)?([0-9]+)"), "video"),
+    (re.compile(r"^/reel/([0-9]+)"), "video"),
+    (re.compile(r"^/share/(?:p|v|r)/([^/]+)"), "share"),
+    (re.compile(r"^/([0-9]{5,})/?$"), "post"),
+]
+
+
+def _identity(kind, value):
+    """Turn a raw identifier into (key, post_id)."""
+    value = unquote(value).strip()
+    if kind == "post" and _NUMERIC.match(value):
+        return f"post:{value}", value
+    if kind == "post" and _PFBID.match(value):
+        return f"pfbid:{value}", None
+    return f"{kind}:{value}", None
+
+
+def canonicalize_url(url):
+    """
+    Map any of the URL shapes a post arrives under to one index key.
+
+    Handles www/mobile/mbasic/web hosts, l.facebook.com redirects, story.php and
+    permalink.php, /<page>/posts/<id|pfbid>, group permalinks, video/reel links
+    and /share/p/ links. Tracking query parameters are ignored.
+
+    Returns:
+        dict: key (index key), post_id (numeric id when the URL carries it, else None)
+        and url (normalized https://www.facebook.com URL).
+    """
+    parsed = urlparse(url.strip() if "://" in url else f"https://{url.strip()}")
+    host = (parsed.hostname or "").lower()
+    query = parse_qs(parsed.query)
+
+    # Unwrap outbound redirect links
+    if host in ("l.facebook.com", "lm.facebook.com") and query.get("u"):
+        return canonicalize_url(query["u"][0])
+
+    if host in _HOST_ALIASES:
+        host = FACEBOOK_HOST
+    path = re.sub(r"/+", "/", parsed.path or "/").rstrip("/") or "/"
+
+    if path in ("/story.php", "/permalink.php") and query.get("story_fbid"):
+        key, post_id = _identity("post", query["story_fbid"][0])
+        owner = query.get("id", [""])[0]
+        normalized = f"https://{host}{path}?story_fbid={query['story_fbid'][0]}" + (f"&id={owner}" if owner else "")
+        return {"key": key, "post_id": post_id, "url": normalized}
+
+    if path in ("/watch", "/photo.php", "/photo") and (query.get("v") or query.get("fbid")):
+        kind, value = ("video", query["v"][0]) if query.get("v") else ("photo", query["fbid"][0])
+        key, post_id = _identity(kind, value)
+        return {"key": key, "post_id": post_id, "url": f"https://{host}{path}?{'v' if kind == 'video' else 'fbid'}={value}"}
+
+    for pattern, kind in _PATH_PATTERNS:
+        match = pattern.match(path)
+        if match:
+            key, post_id = _identity(kind, match.group(1))
+            return {"key": key, "post_id": post_id, "url": f"https://{host}{path}"}
+
+    return {"key": f"url:{host}{path}", "post_id": None, "url": f"https://{host}{path}"}
+
+
+def canonical_post_url(post_id):
+    return f"https://{FACEBOOK_HOST}/{post_id}"
+
+
+class PostIndex:
+    """
+    Persistent (SQLite) URL key -> post_id/feedback_id index.
+
+    Also caches the post-level fields of the last full bootstrap and the most
+    recent GraphQL session tokens/cookies, so a known post can be crawled
+    without loading its page while the session is younger than session_ttl
+    and its cached post fields are younger than post_ttl.
+    """
+
+    def __init__(self, path, session_ttl=1800, post_ttl=600):
+        self.path = path
+        self.session_ttl = session_ttl
+        self.post_ttl = post_ttl
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS url_keys (
+                    key TEXT PRIMARY KEY,
+                    post_id TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS posts (
+                    post_id TEXT PRIMARY KEY,
+                    feedback_id TEXT NOT NULL,
+                    url TEXT,
+                    post_json TEXT,
+                    post_updated_at REAL,
+                    updated_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS sessions (
+                    id INTEGER PRIMARY KEY CHECK (id = 1),
+                    params_json TEXT NOT NULL,
+                    cookies_json TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                );
+            """)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(posts)")}
+            if "post_updated_at" not in columns:
+                conn.execute("ALTER TABLE posts ADD COLUMN post_updated_at REAL")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def lookup(self, key):
+        """
+        Return {"post_id", "feedback_id", "url", "post", "updated_at"} for a URL key, or None.
+
+        "post" (the cached post-level fields) is None once older than post_ttl.
+        """
+        with self._lock, self._connect() as conn:
+            row = conn.execute("""
+                SELECT p.post_id, p.feedback_id, p.url, p.post_json, p.post_updated_at
+                FROM url_keys k JOIN posts p ON p.post_id = k.post_id
+                WHERE k.key = ?
+            """, (key,)).fetchone()
+        if row is None:
+            return None
+        fresh = row[3] and row[4] is not None and time.time() - row[4] <= self.post_ttl
+        return {
+            "post_id": row[0], "feedback_id": row[1], "url": row[2],
+            "post": json.loads(row[3]) if fresh else None, "updated_at": row[4],
+        }
+
+    def remember(self, keys, post_id, feedback_id, url=None, post=None):
+        """Record that every key in keys resolves to post_id, refreshing the cached post fields when given."""
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute("""
+                INSERT INTO posts (post_id, feedback_id, url, post_json, post_updated_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(post_id) DO UPDATE SET
+                    feedback_id = excluded.feedback_id,
+                    url = COALESCE(posts.url, excluded.url),
+                    post_json = COALESCE(excluded.post_json, posts.post_json),
+                    post_updated_at = COALESCE(excluded.post_updated_at, posts.post_updated_at),
+                    updated_at = excluded.updated_at
+            """, (post_id, feedback_id, url, json.dumps(post, default=str) if post else None, now if post else None, now))
+            conn.executemany(
+                "INSERT OR REPLACE INTO url_keys (key, post_id) VALUES (?, ?)",
+                [(key, post_id) for key in set(keys) | {f"post:{post_id}"}]
+            )
+
+    def session(self):
+        """Return the cached {"params", "cookies"} if younger than session_ttl, else None."""
+        with self._lock, self._connect() as conn:
+            row = conn.execute("SELECT params_json, cookies_json, created_at FROM sessions WHERE id = 1").fetchone()
+        if row is None or time.time() - row[2] > self.session_ttl:
+            return None
+        return {"params": json.loads(row[0]), "cookies": json.loads(row[1])}
+
+    def save_session(self, params, cookies):
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO sessions (id, params_json, cookies_json, created_at) VALUES (1, ?, ?, ?)",
+                (json.dumps(params), json.dumps(cookies), time.time())
+            )
+
+
+_index = {"instance": None}
+
+
+def get_post_index():
+    """Shared index at POST_INDEX_PATH (default .cache/post_index.sqlite3); an empty path disables it."""
+    path = os.getenv("POST_INDEX_PATH", ".cache/post_index.sqlite3")
+    if not path:
+        return None
+    instance = _index["instance"]
+    if instance is None or instance.path != path:
+        instance = PostIndex(
+            path,
+            int(os.getenv("POST_INDEX_SESSION_TTL", "1800")),
+            int(os.getenv("POST_INDEX_POST_TTL", "600")),
+        )
+        _index["instance"] = instance
+    return instance
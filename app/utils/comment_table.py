@@ -0,0 +1,217 @@
+import calendar
+import sys
+import time
+from array import array
+
+# Sentinel stored in every integer column when the upstream value is missing
+# (and in ``parent`` for top-level comments); exported as null.
+MISSING = -1
+
+
+def to_epoch(value):
+    """Convert a created_time value (epoch number or formatted UTC string) to an integer epoch."""
+    if value is None or value == "":
+        return MISSING
+    if isinstance(value, (int, float)):
+        return int(value)
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        return calendar.timegm(time.strptime(value, '%Y-%m-%d %H:%M:%S UTC'))
+    except (TypeError, ValueError):
+        return MISSING
+
+
+def _to_int(value, default=MISSING):
+    try:
+        return int(value) if value is not None else default
+    except (TypeError, ValueError):
+        return default
+
+
+class StringPool:
+    """Intern repeated strings into dense integer codes (MISSING for None)."""
+
+    def __init__(self):
+        self.values = []
+        self._codes = {}
+
+    def intern(self, value):
+        if value is None:
+            return MISSING
+        value = str(value)
+        code = self._codes.get(value)
+        if code is None:
+            code = len(self.values)
+            value = sys.intern(value)
+            self._codes[value] = code
+            self.values.append(value)
+        return code
+
+    def lookup(self, code):
+        return None if code < 0 else self.values[code]
+
+    def __len__(self):
+        return len(self.values)
+
+
+class CommentTable:
+    """
+    Columnar table of comments and replies.
+
+    Authors and author IDs are stored as codes into per-column string pools,
+    timestamps and counts live in typed arrays, and replies point at their
+    parent row through the ``parent`` index array (MISSING for top-level
+    comments). Missing integers are stored as MISSING and become nulls in
+    pandas/Arrow, whose integer columns wrap the table's buffers without copying.
+
+    Exports are read-only views, and the table is frozen while any of them is
+    alive: ``append`` raises BufferError until they are released. Copy an
+    export (e.g. ``df.copy()``) to keep it while the table keeps growing.
+    """
+
+    int_columns = ("created_time", "reaction_count", "reply_count", "parent")
+    pooled_columns = ("author", "author_id")
+    object_columns = ("comment_id", "legacy_fbid", "feedback_id", "text")
+
+    def __init__(self, post=None):
+        self.post = post or {}
+        self.pools = {name: StringPool() for name in self.pooled_columns}
+        self.codes = {name: array("q") for name in self.pooled_columns}
+        self.ints = {name: array("q") for name in self.int_columns}
+        self.objects = {name: [] for name in self.object_columns}
+        self._child_links = None
+
+    def __len__(self):
+        return len(self.ints["parent"])
+
+    def append(self, comment, parent=MISSING):
+        """Append a comment or reply dict and return its row index."""
+        # parent goes first: if exports pin the buffers it fails before any column grows
+        try:
+            self.ints["parent"].append(parent)
+        except BufferError:
+            raise BufferError(
+                "CommentTable is frozen while numpy/pandas/Arrow exports of it are alive; "
+                "release them or copy the export before appending"
+            ) from None
+        for name in self.pooled_columns:
+            self.codes[name].append(self.pools[name].intern(comment.get(name)))
+        self.objects["comment_id"].append(comment.get("comment_id") or comment.get("reply_id"))
+        self.objects["legacy_fbid"].append(comment.get("legacy_fbid"))
+        self.objects["feedback_id"].append(comment.get("feedback_id"))
+        self.objects["text"].append(comment.get("text"))
+        self.ints["created_time"].append(to_epoch(comment.get("created_time")))
+        self.ints["reaction_count"].append(_to_int(comment.get("reaction_count")))
+        self.ints["reply_count"].append(_to_int(comment.get("reply_count")))
+        self._child_links = None
+        return len(self) - 1
+
+    def extend(self, comments, parent=MISSING):
+        """Append comments and, recursively, their nested ``replies``."""
+        for comment in comments or []:
+            index = self.append(comment, parent)
+            self.extend(comment.get("replies"), index)
+
+    @classmethod
+    def from_comments(cls, comments, post=None):
+        table = cls(post)
+        table.extend(comments)
+        return table
+
+    @classmethod
+    def from_post_data(cls, post_data):
+        """Build a table from a ``scrape_facebook_post`` result; post-level fields are kept in ``post``."""
+        post = {key: value for key, value in post_data.items() if key != "comments"}
+        post["comments_total_count"] = (post_data.get("comments") or {}).get("total_count")
+        return cls.from_comments((post_data.get("comments") or {}).get("details", []), post)
+
+    def row(self, index):
+        """Materialize one row as a dict (timestamps stay integer epochs)."""
+        result = {name: self.pools[name].lookup(self.codes[name][index]) for name in self.pooled_columns}
+        result.update({name: self.objects[name][index] for name in self.object_columns})
+        result.update({name: self.ints[name][index] for name in self.int_columns})
+        return result
+
+    def child_links(self):
+        """
+        Return the reply tree in CSR form as (child_offsets, child_index) arrays.
+
+        The direct replies of row ``i`` are ``child_index[child_offsets[i]:child_offsets[i + 1]]``.
+        Built in O(n) from ``parent`` and cached until the next append.
+        """
+        if self._child_links is None:
+            parents = self.ints["parent"]
+            offsets = array("q", bytes(8 * (len(self) + 1)))
+            for parent in parents:
+                if parent != MISSING:
+                    offsets[parent + 1] += 1
+            for i in range(len(self)):
+                offsets[i + 1] += offsets[i]
+            child_index = array("q", bytes(8 * offsets[-1]))
+            fill = array("q", offsets)
+            for row, parent in enumerate(parents):
+                if parent != MISSING:
+                    child_index[fill[parent]] = row
+                    fill[parent] += 1
+            self._child_links = (offsets, child_index)
+        return self._child_links
+
+    def children(self, index):
+        """Row indexes of the direct replies to ``index``."""
+        offsets, child_index = self.child_links()
+        return child_index[offsets[index]:offsets[index + 1]].tolist()
+
+    def to_records(self):
+        return [self.row(i) for i in range(len(self))]
+
+    def to_numpy(self):
+        """Return integer and code columns as read-only numpy views over the table's buffers (MISSING kept as -1)."""
+        import numpy as np
+
+        columns = {name: np.frombuffer(self.ints[name], dtype=np.int64) for name in self.int_columns}
+        columns.update({f"{name}_code": np.frombuffer(self.codes[name], dtype=np.int64) for name in self.pooled_columns})
+        for column in columns.values():
+            column.flags.writeable = False
+        return columns
+
+    def to_pandas(self):
+        """Build a DataFrame; pooled columns become categoricals and integer columns nullable Int64 (MISSING -> <NA>)."""
+        import pandas as pd
+
+        arrays = self.to_numpy()
+        data = {
+            name: pd.Categorical.from_codes(arrays[f"{name}_code"], categories=pd.Index(self.pools[name].values, dtype=object), validate=False)
+            for name in self.pooled_columns
+        }
+        data.update({name: self.objects[name] for name in self.object_columns})
+        data.update({
+            name: pd.arrays.IntegerArray(arrays[name], arrays[name] == MISSING, copy=False)
+            for name in self.int_columns
+        })
+        return pd.DataFrame(data, copy=False)
+
+    def to_arrow(self):
+        """Build a pyarrow Table; pooled columns become dictionary arrays."""
+        try:
+            import pyarrow as pa
+        except ImportError as e:
+            raise ImportError("pyarrow is required for CommentTable.to_arrow/to_parquet") from e
+
+        arrays = self.to_numpy()
+        columns = {}
+        for name in self.pooled_columns:
+            codes = arrays[f"{name}_code"]
+            columns[name] = pa.DictionaryArray.from_arrays(
+                pa.array(codes, mask=codes < 0), pa.array(self.pools[name].values, type=pa.string())
+            )
+        columns.update({name: pa.array(self.objects[name], type=pa.string()) for name in self.object_columns})
+        columns.update({name: pa.array(arrays[name], mask=arrays[name] == MISSING) for name in self.int_columns})
+        return pa.table(columns)
+
+    def to_parquet(self, path, **kwargs):
+        import pyarrow.parquet as pq
+
+        pq.write_table(self.to_arrow(), path, **kwargs)
@@ -0,0 +1,185 @@
+import codecs
+import threading
+import time
+import zlib
+
+
+def _load_brotli():
+    try:
+        import brotli
+        return brotli
+    except ImportError:
+        try:
+            import brotlicffi as brotli
+            return brotli
+        except ImportError:
+            return None
+
+
+def _load_zstd():
+    try:
+        import zstandard
+        return zstandard
+    except ImportError:
+        return None
+
+
+def supported_encodings():
+    """Content codings we can decode, best compression first."""
+    encodings = []
+    if _load_zstd():
+        encodings.append("zstd")
+    if _load_brotli():
+        encodings.append("br")
+    encodings.extend(["gzip", "deflate"])
+    return encodings
+
+
+def accept_encoding_header():
+    return ", ".join(supported_encodings())
+
+
+class _ZlibDecoder:
+    def __init__(self, wbits):
+        self._obj = zlib.decompressobj(wbits)
+
+    def decompress(self, chunk):
+        return self._obj.decompress(chunk)
+
+    def flush(self):
+        return self._obj.flush()
+
+
+class _DeflateDecoder:
+    """Content-Encoding: deflate is meant to be zlib-wrapped, but some servers send raw deflate; sniff the header."""
+
+    def __init__(self):
+        self._obj = None
+        self._pending = b""
+
+    def _start(self, head):
+        # zlib header: CM=8 in the low nibble and the first two bytes a multiple of 31
+        wrapped = len(head) >= 2 and head[0] & 0x0F == 8 and (head[0] * 256 + head[1]) % 31 == 0
+        self._obj = zlib.decompressobj(zlib.MAX_WBITS if wrapped else -zlib.MAX_WBITS)
+
+    def decompress(self, chunk):
+        if self._obj is None:
+            self._pending += chunk
+            if len(self._pending) < 2:
+                return b""
+            chunk, self._pending = self._pending, b""
+            self._start(chunk)
+        return self._obj.decompress(chunk)
+
+    def flush(self):
+        if self._obj is None:
+            chunk, self._pending = self._pending, b""
+            self._start(chunk)
+            return self._obj.decompress(chunk) + self._obj.flush()
+        return self._obj.flush()
+
+
+class _BrotliDecoder:
+    def __init__(self, brotli):
+        self._obj = brotli.Decompressor()
+        # brotli exposes process(), brotlicffi exposes decompress()
+        self._process = getattr(self._obj, "process", None) or self._obj.decompress
+
+    def decompress(self, chunk):
+        return self._process(chunk)
+
+    def flush(self):
+        return b""
+
+
+class _ZstdDecoder:
+    def __init__(self, zstandard):
+        self._obj = zstandard.ZstdDecompressor().decompressobj()
+
+    def decompress(self, chunk):
+        return self._obj.decompress(chunk)
+
+    def flush(self):
+        return b""
+
+
+def make_decoder(content_encoding):
+    """Return an incremental decoder for a Content-Encoding value, or None for identity."""
+    encoding = (content_encoding or "identity").strip().lower()
+    if encoding in ("", "identity"):
+        return None
+    if encoding in ("gzip", "x-gzip"):
+        return _ZlibDecoder(16 + zlib.MAX_WBITS)
+    if encoding == "deflate":
+        return _DeflateDecoder()
+    if encoding == "br" and _load_brotli():
+        return _BrotliDecoder(_load_brotli())
+    if encoding == "zstd" and _load_zstd():
+        return _ZstdDecoder(_load_zstd())
+    raise ValueError(f"Unsupported Content-Encoding: {content_encoding}")
+
+
+class TransferStats:
+    """Per-scrape accounting of bytes on the wire vs. decoded bytes (thread-safe)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.wire_bytes = 0
+        self.decoded_bytes = 0
+        self.seconds = 0.0
+        self.encodings = {}
+
+    def record(self, encoding, wire_bytes, decoded_bytes, seconds):
+        with self._lock:
+            self.requests += 1
+            self.wire_bytes += wire_bytes
+            self.decoded_bytes += decoded_bytes
+            self.seconds += seconds
+            self.encodings[encoding] = self.encodings.get(encoding, 0) + 1
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "wire_bytes": self.wire_bytes,
+                "decoded_bytes": self.decoded_bytes,
+                "compression_ratio": round(self.decoded_bytes / self.wire_bytes, 2) if self.wire_bytes else None,
+                "transfer_seconds": round(self.seconds, 3),
+                "encodings": dict(self.encodings),
+            }
+
+
+def read_response_text(response, stats=None, started=None, chunk_size=65536):
+    """
+    Read a streamed requests response, decompressing chunk by chunk as it arrives.
+
+    Args:
+        response: A requests.Response obtained with stream=True.
+        stats (TransferStats, optional): Accumulator for wire/decoded byte counts.
+        started (float, optional): time.perf_counter() value when the request was sent.
+        chunk_size (int): Size of raw reads from the socket.
+
+    Returns:
+        str: The decoded response body.
+    """
+    encoding = response.headers.get("Content-Encoding", "identity")
+    decoder = make_decoder(encoding)
+    text_decoder = codecs.getincrementaldecoder(response.encoding or "utf-8")(errors="replace")
+    parts = []
+    wire_bytes = 0
+    decoded_bytes = 0
+
+    for chunk in response.raw.stream(chunk_size, decode_content=False):
+        wire_bytes += len(chunk)
+        data = decoder.decompress(chunk) if decoder else chunk
+        decoded_bytes += len(data)
+        parts.append(text_decoder.decode(data))
+    tail = decoder.flush() if decoder else b""
+    decoded_bytes += len(tail)
+    parts.append(text_decoder.decode(tail, final=True))
+
+    if stats is not None:
+        elapsed = time.perf_counter() - started if started is not None else 0.0
+        stats.record(encoding, wire_bytes, decoded_bytes, elapsed)
+    return "".join(parts)
@@ -2,9 +2,6 @@ import datetime
 import json
 import re
 import base64
-import pandas as pd
-from openpyxl import Workbook
-from openpyxl.utils.dataframe import dataframe_to_rows
 
 def deep_get(dct, keys, default=None):
     """Safely get nested dict value by a list or single key."""
@@ -37,13 +34,16 @@ def clean_graphql_response(response_text: str) -> str:
     cleaned_response = re.sub(unwanted_pattern, '', response_text, flags=re.DOTALL)
     return cleaned_response.rstrip('}, \n')
 
-def parse_graphql_comment_replies(response, response_type):
-    """Parse GraphQL response for comments or replies, based on response_type ('comments' or 'replies')."""
+def parse_graphql_comment_replies(response, response_type, raw_timestamps=False):
+    """Parse GraphQL response for comments or replies, based on response_type ('comments' or 'replies').
+
+    With raw_timestamps=True, created_time is kept as the integer epoch instead of a formatted string.
+    """
     try:
         data = json.loads(response)
     except json.JSONDecodeError:
         print(f"Error: Invalid JSON response for {response_type}")
-        return {"results": [], "page_info": {"end_cursor": None, "has_next_page": False}}
+        return {"results": [], "page_info": {"end_cursor": None, "has_next_page": False}, "error": "invalid_json"}
 
     # Define paths based on response type
     if response_type == "comments":
@@ -75,7 +75,9 @@ def parse_graphql_comment_replies(response, response_type):
             "reaction_count": ["feedback", "reactors", "count_reduced"],
             "profile_picture": ["author", "profile_picture_depth_0", "uri"],
             "gender": ["author", "gender"],
-            "feedback_id": ["feedback", "id"]
+            "reply_count": ["feedback", "replies_fields", "total_count"],
+            "feedback_id": ["feedback", "id"],
+            "expansion_token": ["feedback", "expansion_info", "expansion_token"]
         }
     else:
         raise ValueError(f"Invalid response_type: {response_type}")
@@ -88,7 +90,7 @@ def parse_graphql_comment_replies(response, response_type):
             break
     if not (isinstance(container, dict) and "edges" in container):
         print(f"Error: No {response_type}_connection found in response")
-        return {"results": [], "page_info": {"end_cursor": None, "has_next_page": False}}
+        return {"results": [], "page_info": {"end_cursor": None, "has_next_page": False}, "error": "missing_connection"}
 
     # Extract pagination info
     page_info = deep_get(container, "page_info", {})
@@ -104,7 +106,7 @@ def parse_graphql_comment_replies(response, response_type):
         for field, path in node_fields.items():
             value = deep_get(node, path)
             if field == "created_time" and value:
-                if isinstance(value, (int, float)):
+                if isinstance(value, (int, float)) and not raw_timestamps:
                     value = datetime.datetime.fromtimestamp(
                         value, tz=datetime.timezone.utc
                     ).strftime('%Y-%m-%d %H:%M:%S UTC')
@@ -112,9 +114,8 @@ def parse_graphql_comment_replies(response, response_type):
                 value = 0
             result[field] = value
 
-        # Add replies list for comments
-        if response_type == "comments":
-            result["replies"] = []
+        # Nested replies are filled in by the crawler
+        result["replies"] = []
 
         results.append(result)
 
@@ -126,6 +127,33 @@ def parse_graphql_comment_replies(response, response_type):
         }
     }
 
+def merge_comments(post_info, comment_data):
+    """Merge crawled comment sets into post_info["comments"], skipping comments already present."""
+    if not comment_data:
+        return post_info
+    comments = post_info.setdefault("comments", {"total_count": 0, "details": []})
+    seen = {c.get("comment_id") for c in comments["details"]}
+    for comment_set in comment_data:
+        comments["total_count"] = max(comments.get("total_count") or 0, len(comment_set))
+        for comment in comment_set:
+            cid = deep_get(comment, "comment_id")
+            if cid in seen:
+                continue
+            seen.add(cid)
+            comments["details"].append({
+                "author": deep_get(comment, "author"),
+                "author_id": deep_get(comment, "author_id"),
+                "text": deep_get(comment, "text"),
+                "comment_id": cid,
+                "legacy_fbid": deep_get(comment, "legacy_fbid"),
+                "created_time": deep_get(comment, "created_time"),
+                "reaction_count": deep_get(comment, "reaction_count"),
+                "reply_count": deep_get(comment, "reply_count", 0),
+                "replies": deep_get(comment, "replies", []),
+                "feedback_id": deep_get(comment, "feedback_id")
+            })
+    return post_info
+
 def parse_facebook_post(data, comment_data=None):
     """Parse Facebook post JSON to extract key info."""
     try:
@@ -220,26 +248,7 @@ def parse_facebook_post(data, comment_data=None):
             })
 
         # Additional comments from comment_data
-        if comment_data:
-            for comment_set in comment_data:
-                post_info["comments"]["total_count"] = max(
-                    post_info["comments"]["total_count"], len(comment_set)
-                )
-                for comment in comment_set:
-                    cid = deep_get(comment, "comment_id")
-                    if not any(c["comment_id"] == cid for c in post_info["comments"]["details"]):
-                        post_info["comments"]["details"].append({
-                            "author": deep_get(comment, "author"),
-                            "author_id": deep_get(comment, "author_id"),
-                            "text": deep_get(comment, "text"),
-                            "comment_id": cid,
-                            "legacy_fbid": deep_get(comment, "legacy_fbid"),
-                            "created_time": deep_get(comment, "created_time"),
-                            "reaction_count": deep_get(comment, "reaction_count"),
-                            "reply_count": deep_get(comment, "reply_count", 0),
-                            "replies": deep_get(comment, "replies", []),
-                            "feedback_id": deep_get(comment, "feedback_id")
-                        })
+        merge_comments(post_info, comment_data)
 
         # Author info & privacy
         ctx_md = deep_get(cs, ["context_layout", "story", "comet_sections", "metadata"], [])
@@ -325,6 +334,11 @@ async def parse_html_for_params(html_content, required_params):
 
 def save_to_excel(post_data, filename):
     """Save post and comments data to an Excel file with two sheets."""
+    # Imported lazily to keep app startup fast
+    import pandas as pd
+    from openpyxl import Workbook
+    from openpyxl.utils.dataframe import dataframe_to_rows
+
     # Prepare data for Post sheet
     post_info = {
         "post_id": post_data.get("post_id"),
@@ -342,7 +356,9 @@ def save_to_excel(post_data, filename):
         "comments_total_count": post_data.get("comments", {}).get("total_count"),
         "attachment_title": post_data.get("attachment", {}).get("title"),
         "attachment_image_url": post_data.get("attachment", {}).get("image_url"),
-        "attachment_media_id": post_data.get("attachment", {}).get("media_id")
+        "attachment_media_id": post_data.get("attachment", {}).get("media_id"),
+        "partial": post_data.get("partial", False),
+        "resume_cursor": post_data.get("budget", {}).get("resume_cursor")
     }
     post_df = pd.DataFrame([post_info])
 
@@ -361,7 +377,9 @@ def save_to_excel(post_data, filename):
             "reply_count": comment.get("reply_count"),
             "feedback_id": comment.get("feedback_id")
         })
-        for reply in comment.get("replies", []):
+        replies = list(comment.get("replies", []))
+        while replies:
+            reply = replies.pop(0)
             flat_comments.append({
                 "author": reply.get("author"),
                 "author_id": reply.get("author_id"),
@@ -370,9 +388,10 @@ def save_to_excel(post_data, filename):
                 "legacy_fbid": reply.get("legacy_fbid"),
                 "created_time": reply.get("created_time"),
                 "reaction_count": reply.get("reaction_count"),
-                "reply_count": 0,
+                "reply_count": reply.get("reply_count", 0),
                 "feedback_id": reply.get("feedback_id")
             })
+            replies[:0] = reply.get("replies", [])
     comments_df = pd.DataFrame(flat_comments if flat_comments else [{"author": "No comments found", "comment_id": None}])
 
     # Create Excel file
@@ -393,4 +412,33 @@ def save_to_excel(post_data, filename):
         workbook.remove(workbook["Sheet"])
 
     # Save to file
-    workbook.save(filename)
\ No newline at end of file
+    workbook.save(filename)
+
+def parse_post_html(html_content, comment_data=None):
+    """Parse a post page's HTML and merge crawled comments; picklable entry point for the CPU executor."""
+    parsed_data = parse_content(html_content)
+    if not parsed_data:
+        return None
+    return parse_facebook_post(parsed_data, comment_data)
+
+def export_excel_bytes(post_data):
+    """Build the Excel workbook in memory and return its bytes (one buffer to send back from a worker)."""
+    import io
+
+    output = io.BytesIO()
+    save_to_excel(post_data, output)
+    return output.getvalue()
+
+def warm_up_parsers():
+    """Run the parsing helpers on tiny samples so regexes, JSON paths and export modules are loaded before the first request."""
+    extract_post_id_from_html('"post_id":"1000000000"')
+    extract_post_id_from_html('"feedback_id":"ZmVlZGJhY2s61000000000"')
+    encode_feedback_id("1000000000")
+    parse_content('{"data": {"node": {}}}')
+    parse_content('x"data":{"node":{}},"extensions"')
+    clean_graphql_response('{"data": {}}')
+    parse_graphql_comment_replies('{"node": {"comment_rendering_instance_for_feed_location": {"comments": {"edges": []}}}}', "comments")
+    parse_graphql_comment_replies('{"data": {"node": {"replies_connection": {"edges": []}}}}', "replies")
+    parse_facebook_post({"node": {}})
+    import pandas  # noqa: F401
+    import openpyxl  # noqa: F401
@@ -0,0 +1,65 @@
+"""
+Event-loop lag benchmark: run post parsing and Excel export for a synthetic
+post inline on the event loop and through the executor, and report the lag
+measured by LoopLagMonitor in each case.
+
+    python scripts/bench_loop_lag.py --comments 5000
+    python scripts/bench_loop_lag.py --modes inline thread process --no-export
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.executor import LoopLagMonitor, make_executor, run_in  # noqa: E402
+from app.utils.utils import export_excel_bytes, parse_post_html  # noqa: E402
+
+
+def synthetic_post(comments):
+    edges = [{"node": {"id": f"c{i}"}} for i in range(min(comments, 50))]
+    html = json.dumps({"data": {"node": {"id": "1", "comet_sections": {"feedback": {"story": {"story_ufi_container": {"story": {"feedback_context": {"feedback_target_with_context": {"comet_ufi_summary_and_actions_renderer": {"feedback": {}}, "comment_list_renderer": {"feedback": {"comment_rendering_instance_for_feed_location": {"comments": {"edges": edges}}}}}}}}}}}}}, "extensions": {}})
+    comment_data = [[{
+        "author": f"user {i % 300}", "author_id": str(i % 300), "text": "lorem ipsum " * 8,
+        "comment_id": f"c{i}", "created_time": 1700000000 + i, "reply_count": 2,
+        "replies": [{"author": "a", "author_id": "1", "reply_id": f"r{i}-{k}", "text": "ok"} for k in range(2)],
+    } for i in range(comments)]]
+    return html, comment_data
+
+
+async def measure(mode, html, comment_data, export):
+    # Each mode gets its own pool, so the app's shared executor is never touched
+    pool = make_executor(mode)
+    monitor = LoopLagMonitor(interval=0.01)
+    await run_in(pool, len, "")  # spawn the workers outside the measurement
+    monitor.start()
+    await asyncio.sleep(0.05)  # let the monitor tick before the work starts
+    start = time.perf_counter()
+    post_data = await run_in(pool, parse_post_html, html, comment_data)
+    if export:
+        await run_in(pool, export_excel_bytes, post_data)
+    elapsed = time.perf_counter() - start
+    await asyncio.sleep(0.05)
+    await monitor.stop()
+    if pool is not None:
+        pool.shutdown()
+    return {"mode": mode, "elapsed_s": round(elapsed, 3), **monitor.as_dict()}
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--comments", type=int, default=5000)
+    parser.add_argument("--modes", nargs="+", default=["inline", "process"])
+    parser.add_argument("--no-export", action="store_true", help="Skip the Excel export (no pandas/openpyxl needed)")
+    args = parser.parse_args()
+
+    html, comment_data = synthetic_post(args.comments)
+    for mode in args.modes:
+        print(json.dumps(await measure(mode, html, comment_data, not args.no_export)))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
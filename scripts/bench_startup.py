@@ -0,0 +1,103 @@
+"""
+Startup-time benchmark: import latency of app.main, time until a real uvicorn
+process answers, and latency of the first requests.
+
+Each measurement runs in fresh processes so module caches do not leak between
+runs. Only the app's own requirements are needed.
+
+    python scripts/bench_startup.py                  # cold start, GET /
+    python scripts/bench_startup.py --warmup         # with SCRAPER_WARMUP=1
+    python scripts/bench_startup.py --url <post-url> # also time a first POST /scrape
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_PROBE = r"""
+import json, sys, time
+start = time.perf_counter()
+import app.main
+import_s = time.perf_counter() - start
+heavy = sorted(m for m in ("pandas", "openpyxl", "playwright", "requests") if m in sys.modules)
+print(json.dumps({"import_s": round(import_s, 4), "heavy_modules_after_import": heavy}))
+"""
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def timed_request(url, data=None, timeout=300):
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(url, data=data, timeout=timeout) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    return round(time.perf_counter() - start, 4), status
+
+
+def run_probe(url=None, warmup=False, ready_timeout=120):
+    env = dict(os.environ, SCRAPER_WARMUP="1" if warmup else "0")
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_PROBE], cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env=env
+    )
+    try:
+        # Startup completes (including the lifespan warm-up) once the socket answers
+        while True:
+            try:
+                with socket.create_connection(("127.0.0.1", port), timeout=0.1):
+                    break
+            except OSError:
+                if server.poll() is not None:
+                    raise RuntimeError("uvicorn exited during startup")
+                if time.perf_counter() - start > ready_timeout:
+                    raise RuntimeError("uvicorn did not start in time")
+                time.sleep(0.02)
+        result["startup_s"] = round(time.perf_counter() - start, 4)
+        result["first_get_s"], _ = timed_request(f"{base}/")
+        if url:
+            data = urllib.parse.urlencode({"url": url}).encode()
+            result["first_scrape_s"], result["first_scrape_status"] = timed_request(f"{base}/scrape", data)
+    finally:
+        server.terminate()
+        server.wait()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Facebook post URL for a first /scrape request")
+    parser.add_argument("--warmup", action="store_true", help="Enable the lifespan warm-up phase")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    for run in range(args.runs):
+        result = run_probe(args.url, args.warmup)
+        result.update({"run": run + 1, "warmup": args.warmup})
+        print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()